@@ -0,0 +1,134 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Defaults for admin/analytics reads; writes always go through the primary client.
+# Reads stay on the primary unless a deployment opts in, since secondaries may
+# lag behind and miss a consultation that was just posted.
+DEFAULT_READ_PREFERENCE = "primary"
+DEFAULT_READ_CONCERN = "local"
+
+READ_PREFERENCES = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+READ_CONCERNS = ("local", "available", "majority", "linearizable", "snapshot")
+
+# Commands labelled as reads/writes when reporting which node served a query;
+# anything else (ping, hello, killCursors, ...) is reported by name only
+READ_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct"}
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify"}
+
+
+class ServedByListener(monitoring.CommandListener):
+    """Log the host:port of the node that served each command"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        host, port = event.connection_id
+        if event.command_name in READ_COMMANDS:
+            command = f"read {event.command_name}"
+        elif event.command_name in WRITE_COMMANDS:
+            command = f"write {event.command_name}"
+        else:
+            command = event.command_name
+        logger.info(
+            f"{command} on {event.database_name} "
+            f"served by {host}:{port} in {event.duration_micros}us"
+        )
+
+    def failed(self, event):
+        host, port = event.connection_id
+        logger.warning(
+            f"{event.command_name} on {event.database_name} "
+            f"failed on {host}:{port}: {event.failure}"
+        )
+
+
+def _client_kwargs():
+    """Extra client options shared by the writer and reader clients"""
+    if os.environ.get('MONGO_LOG_SERVED_BY', '').lower() in ('1', 'true', 'yes'):
+        return {"event_listeners": [ServedByListener()]}
+    return {}
+
+
+def create_clients(mongo_url):
+    """
+    Create the writer client and the reader client
+
+    The reader client is a separate connection pool when MONGO_READ_URL is set
+    (e.g. a replica set URL or a dedicated analytics node); otherwise it is the
+    writer client and reads are routed by read preference alone.
+
+    Args:
+        mongo_url: Connection string for the primary (writer) client
+
+    Returns:
+        Tuple of (writer client, reader client)
+    """
+    client = AsyncIOMotorClient(mongo_url, **_client_kwargs())
+    read_url = os.environ.get('MONGO_READ_URL')
+    if not read_url:
+        return client, client
+    return client, AsyncIOMotorClient(read_url, **_client_kwargs())
+
+
+def _env_option(router_name, option, default, allowed):
+    """
+    Look up <ROUTER>_<OPTION>, then MONGO_<OPTION>, then the default
+
+    Raises:
+        ValueError: If the configured value is not one of `allowed`
+    """
+    for name in (f'{router_name.upper()}_{option}', f'MONGO_{option}'):
+        value = os.environ.get(name)
+        if value is not None:
+            break
+    else:
+        return default
+    if value not in allowed:
+        raise ValueError(
+            f"Invalid {name}={value!r}; expected one of: {', '.join(allowed)}"
+        )
+    return value
+
+
+def read_options(router_name):
+    """
+    Resolve read preference and read concern for a router
+
+    Looks up <ROUTER>_READ_PREFERENCE / <ROUTER>_READ_CONCERN first, then
+    MONGO_READ_PREFERENCE / MONGO_READ_CONCERN, then the module defaults.
+
+    Args:
+        router_name: Router name used as the env var prefix (e.g. "consultations")
+
+    Returns:
+        Dict of options for Collection.with_options
+
+    Raises:
+        ValueError: If a configured read preference or read concern is invalid,
+            or linearizable is combined with a non-primary read preference
+    """
+    preference = _env_option(router_name, 'READ_PREFERENCE', DEFAULT_READ_PREFERENCE, READ_PREFERENCES)
+    concern = _env_option(router_name, 'READ_CONCERN', DEFAULT_READ_CONCERN, READ_CONCERNS)
+    if concern == 'linearizable' and preference != 'primary':
+        prefix = router_name.upper()
+        raise ValueError(
+            f"Read concern 'linearizable' requires read preference 'primary' for {router_name} "
+            f"(got {preference!r}); check {prefix}_READ_PREFERENCE / MONGO_READ_PREFERENCE "
+            f"and {prefix}_READ_CONCERN / MONGO_READ_CONCERN"
+        )
+    return {
+        "read_preference": make_read_preference(read_pref_mode_from_name(preference), None),
+        "read_concern": ReadConcern(concern),
+    }
+
+
+def get_read_collection(read_db, collection_name, router_name):
+    """Get a collection configured with the router's read preference and concern"""
+    return read_db[collection_name].with_options(**read_options(router_name))
@@ -0,0 +1,312 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from collections import Counter, defaultdict
+from pathlib import Path
+from datetime import datetime
+import asyncio
+import functools
+import hmac
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Profile for the current request, None when the request is not being profiled
+_current_profile = ContextVar('current_profile', default=None)
+
+# Shared no-op context returned by span() when profiling is off
+_NO_SPAN = nullcontext()
+
+# Profile files are named <stamp>-<id>.{spans,stacks}.folded
+_PROFILE_FILE = re.compile(r'^(\d{8}T\d{12}-[0-9a-f]+)\.(spans|stacks)\.folded$')
+
+# Characters that would break a folded line: frame separators, control
+# characters and any whitespace other than a plain space
+_UNSAFE_NAME = re.compile(r'[;\x00-\x1f\x7f]|[^\S ]')
+
+
+class StackSampler:
+    """
+    Sample the stack of one thread at a fixed interval from a background thread
+
+    The sampled thread is the event loop thread, so the stacks cover everything
+    running on the loop while sampling, not only the profiled request.
+
+    Each sample needs the GIL, which the loop thread only gives up every
+    sys.getswitchinterval() (5ms by default) while busy, so intervals below
+    that are not met.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = self._labels
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+                stack.append(f"{label}{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+
+class Profile:
+    """
+    Timing spans and sampled stacks for a single request
+
+    Spans belong to this request only; sampled stacks include any other
+    requests that ran on the event loop at the same time.
+    """
+
+    def __init__(self, name, interval):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+        self.open_spans = []
+        self.handler_start = None
+        self.handler_end = None
+        self.response_start = None
+        self.sampler = StackSampler(threading.get_ident(), interval)
+
+    def add_span(self, name, start, end):
+        path = ';'.join(self.open_spans + [name])
+        self.spans.append((path, start - self.start, end - start))
+
+    def finish(self):
+        """Derive the stages that happen outside the handler"""
+        if self.handler_start is not None:
+            # Body read, JSON decode and request model validation (incl. EmailStr)
+            self.add_span('validate', self.start, self.handler_start)
+        elif self.response_start is not None:
+            # Validation failed (422), so the handler never ran
+            self.add_span('validate', self.start, self.response_start)
+        if self.handler_end is not None and self.response_start is not None:
+            # response_model validation and JSON encoding
+            self.add_span('encode', self.handler_end, self.response_start)
+        self.spans.sort(key=lambda s: s[1])
+
+    def self_times(self):
+        """
+        Self time per span path, in first-seen order
+
+        Repeated spans with the same path are summed, and each span's direct
+        children are subtracted so the values can be stacked in a flamegraph.
+        """
+        totals = defaultdict(float)
+        for path, _, duration in self.spans:
+            totals[path] += duration
+        self_time = dict(totals)
+        for path, total in totals.items():
+            parent = path.rpartition(';')[0]
+            if parent in self_time:
+                self_time[parent] -= total
+        return self_time
+
+    def write(self, output_dir, max_profiles=None):
+        """
+        Write collapsed-stack files for the request
+
+        <id>.spans.folded holds per-stage timings in microseconds and
+        <id>.stacks.folded holds sampled stacks; both can be fed directly to
+        flamegraph.pl or speedscope. When max_profiles is set, the oldest
+        profiles beyond that count are removed.
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        base = output_dir / f"{stamp}-{self.id}"
+        root = _UNSAFE_NAME.sub('_', self.name)
+
+        # Folded counts are self time
+        with open(f"{base}.spans.folded", 'w') as f:
+            for path, duration in self.self_times().items():
+                f.write(f"{root};{path} {max(round(duration * 1_000_000), 0)}\n")
+
+        with open(f"{base}.stacks.folded", 'w') as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f"{root};{stack} {count}\n")
+
+        summary = ', '.join(f"{name}={duration * 1000:.2f}ms" for name, _, duration in self.spans)
+        logger.info(f"Profiled {self.name} [{self.id}]: {summary}")
+
+        if max_profiles:
+            prune_profiles(output_dir, max_profiles)
+
+
+def prune_profiles(output_dir, max_profiles):
+    """Remove the oldest profiles in output_dir, keeping at most max_profiles"""
+    profiles = defaultdict(list)
+    for path in Path(output_dir).glob('*.folded'):
+        match = _PROFILE_FILE.match(path.name)
+        if match:
+            profiles[match.group(1)].append(path)
+    # Names start with a UTC timestamp, so sorting by name is oldest first
+    for name in sorted(profiles)[:-max_profiles]:
+        for path in profiles[name]:
+            path.unlink(missing_ok=True)
+
+
+def span(name):
+    """
+    Time a stage of the current request
+
+    Returns a shared no-op context manager when the request is not profiled.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return _NO_SPAN
+    return _span(profile, name)
+
+
+@contextmanager
+def _span(profile, name):
+    start = time.perf_counter()
+    profile.open_spans.append(name)
+    try:
+        yield
+    finally:
+        profile.open_spans.pop()
+        profile.add_span(name, start, time.perf_counter())
+
+
+def profiled(handler):
+    """Mark handler entry/exit so validation and encoding time can be derived"""
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return await handler(*args, **kwargs)
+        profile.handler_start = time.perf_counter()
+        profile.open_spans.append('handler')
+        try:
+            return await handler(*args, **kwargs)
+        finally:
+            profile.handler_end = time.perf_counter()
+            profile.open_spans.pop()
+            profile.add_span('handler', profile.handler_start, profile.handler_end)
+
+    return wrapper
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request sampling profiler
+
+    A request is profiled when it is picked by the sampling rate, or when it
+    carries the profiling header (e.g. `X-Profile: <token>`) with a value
+    matching the configured token. Without a token the header is ignored.
+
+    Only one request is profiled at a time, so sampler threads never stack
+    up; requests arriving meanwhile pass straight through. Sampled stacks
+    still include unprofiled requests running on the event loop.
+    """
+
+    def __init__(self, app, output_dir, sample_rate=0.0, header='x-profile', token=None,
+                 interval=0.005, max_profiles=100):
+        self.app = app
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.token = token.encode() if token else None
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self._active = False
+
+    def _should_profile(self, scope):
+        if self._active:
+            return False
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.token is None:
+            return False
+        for key, value in scope.get('headers', ()):
+            if key == self.header:
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    def _finish(self, profile):
+        """Stop sampling and write the profile (runs off the event loop)"""
+        profile.sampler.stop()
+        profile.finish()
+        try:
+            profile.write(self.output_dir, self.max_profiles)
+        except OSError as e:
+            logger.error(f"Error writing profile {profile.id}: {str(e)}")
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        profile = Profile(f"{scope['method']} {scope['path']}", self.interval)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and profile.response_start is None:
+                profile.response_start = time.perf_counter()
+            await send(message)
+
+        token = _current_profile.set(profile)
+        profile.sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            try:
+                await asyncio.to_thread(self._finish, profile)
+            finally:
+                self._active = False
+
+
+def add_profiling(app):
+    """
+    Install ProfilingMiddleware when PROFILE_DIR is set
+
+    Env vars:
+        PROFILE_DIR: Directory for collapsed-stack output (unset disables profiling)
+        PROFILE_SAMPLE_RATE: Fraction of requests to profile (default 0)
+        PROFILE_TOKEN: Secret the profiling header must carry (unset ignores the header)
+        PROFILE_HEADER: Request header that forces profiling (default X-Profile)
+        PROFILE_INTERVAL_MS: Stack sampling interval in ms (default 5; the GIL
+            switch interval makes shorter intervals unreliable on a busy loop)
+        PROFILE_MAX_PROFILES: Number of profiles kept in PROFILE_DIR (default 100)
+    """
+    output_dir = os.environ.get('PROFILE_DIR')
+    if not output_dir:
+        return
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=output_dir,
+        sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+        header=os.environ.get('PROFILE_HEADER', 'X-Profile'),
+        token=os.environ.get('PROFILE_TOKEN') or None,
+        interval=float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000,
+        max_profiles=int(os.environ.get('PROFILE_MAX_PROFILES', '100')),
+    )
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from models.consultation import ConsultationCreate, Consultation
+from profiling import profiled, span
 from typing import List
 import logging
 
@@ -9,18 +10,27 @@ router = APIRouter(prefix="/api/consultations", tags=["consultations"])
 
 # Database will be injected from server.py
 consultations_collection = None
+# Admin reads go through a separate collection handle (configurable read preference)
+consultations_read_collection = None
 
 def get_db():
     """Dependency to get database collection"""
     return consultations_collection
 
-def set_db_collection(collection):
-    """Set the database collection from server.py"""
-    global consultations_collection
+def set_db_collection(collection, read_collection=None):
+    """
+    Set the database collections from server.py
+
+    Writes always use `collection` (primary). Admin reads use `read_collection`
+    when given, falling back to `collection`.
+    """
+    global consultations_collection, consultations_read_collection
     consultations_collection = collection
+    consultations_read_collection = read_collection if read_collection is not None else collection
 
 
 @router.post("", response_model=dict, status_code=status.HTTP_201_CREATED)
+@profiled
 async def create_consultation(consultation_data: ConsultationCreate):
     """
     Create a new consultation request
@@ -36,16 +46,18 @@ async def create_consultation(consultation_data: ConsultationCreate):
     """
     try:
         # Create consultation object
-        consultation = Consultation(
-            name=consultation_data.name,
-            email=consultation_data.email,
-            company=consultation_data.company,
-            message=consultation_data.message
-        )
+        with span("build"):
+            consultation = Consultation(
+                name=consultation_data.name,
+                email=consultation_data.email,
+                company=consultation_data.company,
+                message=consultation_data.message
+            )
+            consultation_dict = consultation.dict()
         
         # Insert into database
-        consultation_dict = consultation.dict()
-        result = await consultations_collection.insert_one(consultation_dict)
+        with span("insert_one"):
+            result = await consultations_collection.insert_one(consultation_dict)
         
         if result.inserted_id:
             logger.info(f"New consultation created: {consultation.id} from {consultation.email}")
@@ -91,11 +103,11 @@ async def get_consultations(skip: int = 0, limit: int = 100):
     """
     try:
         # Get consultations from database
-        cursor = consultations_collection.find().sort("createdAt", -1).skip(skip).limit(limit)
+        cursor = consultations_read_collection.find().sort("createdAt", -1).skip(skip).limit(limit)
         consultations = await cursor.to_list(length=limit)
         
         # Count total consultations
-        total_count = await consultations_collection.count_documents({})
+        total_count = await consultations_read_collection.count_documents({})
         
         # Format response
         formatted_consultations = []
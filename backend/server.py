@@ -1,7 +1,6 @@
 from fastapi import FastAPI, APIRouter
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
@@ -12,17 +11,26 @@ from datetime import datetime
 
 # Import consultation routes
 from routes import consultations
+from database import create_clients, get_read_collection
+from profiling import add_profiling, profiled, span
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client, read_client = create_clients(mongo_url)
 db = client[os.environ['DB_NAME']]
+read_db = read_client[os.environ['DB_NAME']]
 
-# Set database collection for consultation routes
-consultations.set_db_collection(db.consultations)
+# Admin reads use the configured read pool (see database.py); writes stay on the primary
+status_checks_read = get_read_collection(read_db, 'status_checks', 'status')
+
+# Set database collections for consultation routes
+consultations.set_db_collection(
+    db.consultations,
+    get_read_collection(read_db, 'consultations', 'consultations')
+)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -46,15 +54,19 @@ async def root():
     return {"message": "STARTON API - Strategy That Builds Momentum"}
 
 @api_router.post("/status", response_model=StatusCheck)
+@profiled
 async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.dict()
-    status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    with span("build"):
+        status_dict = input.dict()
+        status_obj = StatusCheck(**status_dict)
+        status_doc = status_obj.dict()
+    with span("insert_one"):
+        _ = await db.status_checks.insert_one(status_doc)
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+    status_checks = await status_checks_read.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 # Include the api router
@@ -71,6 +83,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (enabled by PROFILE_DIR)
+add_profiling(app)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -81,3 +96,5 @@ logger = logging.getLogger(__name__)
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+    if read_client is not client:
+        read_client.close()
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from models.consultation import ConsultationCreate
+from routes import consultations
+
+
+class StubCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def skip(self, skip):
+        self.docs = self.docs[skip:]
+        return self
+
+    def limit(self, limit):
+        self.docs = self.docs[:limit]
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class StubCollection:
+    """Records which operations were sent to it"""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.calls = []
+
+    def find(self, *args):
+        self.calls.append('find')
+        return StubCursor([dict(d) for d in self.docs])
+
+    async def count_documents(self, query):
+        self.calls.append('count_documents')
+        return len(self.docs)
+
+    async def insert_one(self, doc):
+        self.calls.append('insert_one')
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id='abc')
+
+
+@pytest.fixture
+def collections():
+    primary = StubCollection()
+    reader = StubCollection([{'_id': 1, 'id': 'c1', 'name': 'Jane'}])
+    consultations.set_db_collection(primary, reader)
+    yield primary, reader
+    consultations.set_db_collection(None)
+
+
+def test_get_consultations_uses_read_collection(collections):
+    primary, reader = collections
+    response = asyncio.run(consultations.get_consultations())
+    assert reader.calls == ['find', 'count_documents']
+    assert primary.calls == []
+    assert response['data'] == [{'_id': '1', 'id': 'c1', 'name': 'Jane'}]
+    assert response['total'] == 1
+
+
+def test_create_consultation_writes_to_primary(collections):
+    primary, reader = collections
+    data = ConsultationCreate(
+        name='Jane Doe',
+        email='jane@example.com',
+        message='Looking for brand strategy services'
+    )
+    response = asyncio.run(consultations.create_consultation(data))
+    assert response['success'] is True
+    assert primary.calls == ['insert_one']
+    assert reader.calls == []
+
+
+def test_set_db_collection_falls_back_to_write_collection():
+    primary = StubCollection()
+    consultations.set_db_collection(primary)
+    try:
+        assert consultations.consultations_read_collection is primary
+    finally:
+        consultations.set_db_collection(None)
@@ -0,0 +1,159 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from pymongo.read_preferences import ReadPreference
+
+import database
+
+READ_ENV_VARS = (
+    'MONGO_READ_URL',
+    'MONGO_LOG_SERVED_BY',
+    'MONGO_READ_PREFERENCE',
+    'MONGO_READ_CONCERN',
+    'CONSULTATIONS_READ_PREFERENCE',
+    'CONSULTATIONS_READ_CONCERN',
+    'STATUS_READ_PREFERENCE',
+    'STATUS_READ_CONCERN',
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in READ_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_read_options_default_to_primary():
+    options = database.read_options('consultations')
+    assert options['read_preference'] == ReadPreference.PRIMARY
+    assert options['read_concern'].level == 'local'
+
+
+def test_read_options_use_mongo_env(monkeypatch):
+    monkeypatch.setenv('MONGO_READ_PREFERENCE', 'secondaryPreferred')
+    monkeypatch.setenv('MONGO_READ_CONCERN', 'majority')
+    options = database.read_options('consultations')
+    assert options['read_preference'] == ReadPreference.SECONDARY_PREFERRED
+    assert options['read_concern'].level == 'majority'
+
+
+def test_read_options_router_env_overrides_mongo_env(monkeypatch):
+    monkeypatch.setenv('MONGO_READ_PREFERENCE', 'secondaryPreferred')
+    monkeypatch.setenv('CONSULTATIONS_READ_PREFERENCE', 'nearest')
+    monkeypatch.setenv('CONSULTATIONS_READ_CONCERN', 'available')
+    options = database.read_options('consultations')
+    assert options['read_preference'] == ReadPreference.NEAREST
+    assert options['read_concern'].level == 'available'
+
+    # Other routers only see the MONGO_* values
+    options = database.read_options('status')
+    assert options['read_preference'] == ReadPreference.SECONDARY_PREFERRED
+    assert options['read_concern'].level == 'local'
+
+
+@pytest.mark.parametrize('name, value', [
+    ('CONSULTATIONS_READ_PREFERENCE', 'secondaryPrefered'),
+    ('MONGO_READ_PREFERENCE', 'SECONDARY'),
+    ('CONSULTATIONS_READ_CONCERN', 'majorty'),
+    ('MONGO_READ_CONCERN', ''),
+])
+def test_read_options_reject_invalid_values(monkeypatch, name, value):
+    monkeypatch.setenv(name, value)
+    with pytest.raises(ValueError, match=name):
+        database.read_options('consultations')
+
+
+@pytest.mark.parametrize('env', [
+    {'CONSULTATIONS_READ_PREFERENCE': 'secondaryPreferred', 'MONGO_READ_CONCERN': 'linearizable'},
+    {'MONGO_READ_PREFERENCE': 'nearest', 'CONSULTATIONS_READ_CONCERN': 'linearizable'},
+])
+def test_read_options_reject_linearizable_off_primary(monkeypatch, env):
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    with pytest.raises(ValueError, match='linearizable'):
+        database.read_options('consultations')
+
+
+def test_read_options_allow_linearizable_on_primary(monkeypatch):
+    monkeypatch.setenv('MONGO_READ_CONCERN', 'linearizable')
+    options = database.read_options('consultations')
+    assert options['read_preference'] == ReadPreference.PRIMARY
+    assert options['read_concern'].level == 'linearizable'
+
+
+def test_create_clients_shares_client_without_read_url():
+    client, read_client = database.create_clients('mongodb://localhost:27017')
+    try:
+        assert read_client is client
+        assert client.options.event_listeners == []
+    finally:
+        client.close()
+
+
+def test_create_clients_separate_reader(monkeypatch):
+    monkeypatch.setenv('MONGO_READ_URL', 'mongodb://localhost:27018')
+    monkeypatch.setenv('MONGO_LOG_SERVED_BY', '1')
+    client, read_client = database.create_clients('mongodb://localhost:27017')
+    try:
+        assert read_client is not client
+        for c in (client, read_client):
+            assert any(isinstance(l, database.ServedByListener) for l in c.options.event_listeners)
+    finally:
+        client.close()
+        read_client.close()
+
+
+def test_get_read_collection_applies_router_options(monkeypatch):
+    monkeypatch.setenv('STATUS_READ_PREFERENCE', 'secondary')
+    client, _ = database.create_clients('mongodb://localhost:27017')
+    try:
+        collection = database.get_read_collection(client['starton'], 'status_checks', 'status')
+        assert collection.name == 'status_checks'
+        assert collection.read_preference == ReadPreference.SECONDARY
+    finally:
+        client.close()
+
+
+def _event(command_name, **kwargs):
+    return SimpleNamespace(
+        command_name=command_name,
+        database_name='starton',
+        connection_id=('localhost', 27018),
+        duration_micros=150,
+        **kwargs
+    )
+
+
+def test_served_by_listener_logs_reads_and_writes(caplog):
+    listener = database.ServedByListener()
+    with caplog.at_level(logging.INFO, logger='database'):
+        for command in ('find', 'getMore', 'count', 'distinct', 'insert', 'findAndModify'):
+            listener.succeeded(_event(command))
+    assert caplog.messages == [
+        'read find on starton served by localhost:27018 in 150us',
+        'read getMore on starton served by localhost:27018 in 150us',
+        'read count on starton served by localhost:27018 in 150us',
+        'read distinct on starton served by localhost:27018 in 150us',
+        'write insert on starton served by localhost:27018 in 150us',
+        'write findAndModify on starton served by localhost:27018 in 150us',
+    ]
+
+
+def test_served_by_listener_labels_other_commands_by_name(caplog):
+    listener = database.ServedByListener()
+    with caplog.at_level(logging.INFO, logger='database'):
+        for command in ('ping', 'endSessions', 'killCursors'):
+            listener.succeeded(_event(command))
+    assert caplog.messages == [
+        'ping on starton served by localhost:27018 in 150us',
+        'endSessions on starton served by localhost:27018 in 150us',
+        'killCursors on starton served by localhost:27018 in 150us',
+    ]
+
+
+def test_served_by_listener_logs_failures(caplog):
+    listener = database.ServedByListener()
+    with caplog.at_level(logging.WARNING, logger='database'):
+        listener.failed(_event('aggregate', failure={'errmsg': 'boom'}))
+    assert caplog.messages == ["aggregate on starton failed on localhost:27018: {'errmsg': 'boom'}"]
@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import profiling
+
+
+def _profile():
+    profile = profiling.Profile('POST /api/consultations', interval=0.001)
+    profile.start = 0.0
+    return profile
+
+
+def test_span_is_noop_without_profile():
+    assert profiling.span('build') is profiling._NO_SPAN
+
+
+def test_self_times_subtract_children():
+    profile = _profile()
+    profile.open_spans.append('handler')
+    profile.add_span('build', 1.0, 1.5)
+    profile.add_span('insert_one', 1.5, 3.0)
+    profile.open_spans.pop()
+    profile.add_span('handler', 1.0, 3.25)
+    assert profile.self_times() == pytest.approx({
+        'handler;build': 0.5,
+        'handler;insert_one': 1.5,
+        'handler': 0.25,
+    })
+
+
+def test_self_times_sum_repeated_spans():
+    profile = _profile()
+    profile.open_spans.append('handler')
+    profile.add_span('insert_one', 1.0, 2.0)
+    profile.add_span('insert_one', 2.0, 4.0)
+    profile.open_spans.pop()
+    profile.add_span('handler', 1.0, 5.0)
+    assert profile.self_times() == pytest.approx({'handler;insert_one': 3.0, 'handler': 1.0})
+
+
+def test_write_folded_files(tmp_path):
+    profile = _profile()
+    profile.open_spans.append('handler')
+    profile.add_span('insert_one', 1.0, 1.002)
+    profile.add_span('insert_one', 1.002, 1.003)
+    profile.open_spans.pop()
+    profile.add_span('handler', 1.0, 1.004)
+    profile.sampler.stacks['main (app.py:1);handler (app.py:2)'] = 3
+
+    profile.write(tmp_path)
+
+    spans, = tmp_path.glob('*.spans.folded')
+    stacks, = tmp_path.glob('*.stacks.folded')
+    assert spans.read_text() == (
+        'POST /api/consultations;handler;insert_one 3000\n'
+        'POST /api/consultations;handler 1000\n'
+    )
+    assert stacks.read_text() == 'POST /api/consultations;main (app.py:1);handler (app.py:2) 3\n'
+
+
+def test_write_sanitizes_request_name(tmp_path):
+    profile = profiling.Profile('POST /api/x\n;y\tz\x00', interval=0.001)
+    profile.start = 0.0
+    profile.add_span('validate', 0.0, 0.001)
+    profile.sampler.stacks['main (app.py:1)'] = 1
+
+    profile.write(tmp_path)
+
+    spans, = tmp_path.glob('*.spans.folded')
+    stacks, = tmp_path.glob('*.stacks.folded')
+    assert spans.read_text() == 'POST /api/x__y_z_;validate 1000\n'
+    assert stacks.read_text() == 'POST /api/x__y_z_;main (app.py:1) 1\n'
+
+
+def test_sampler_records_target_thread():
+    sampler = profiling.StackSampler(threading.get_ident(), interval=0.001)
+    sampler.start()
+    deadline = time.perf_counter() + 0.2
+    while not sampler.stacks and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    sampler.stop()
+    stack = next(iter(sampler.stacks))
+    assert 'test_sampler_records_target_thread (test_profiling.py:' in stack
+    # Frame labels are cached per code object
+    assert sampler._labels[test_sampler_records_target_thread.__code__] == (
+        'test_sampler_records_target_thread (test_profiling.py:'
+    )
+
+
+def test_prune_profiles_ignores_other_files(tmp_path):
+    for stamp in ('20260101T000001000000', '20260101T000002000000'):
+        (tmp_path / f"{stamp}-abc.spans.folded").write_text('')
+    (tmp_path / 'merged.folded').write_text('')
+    (tmp_path / 'notes.spans.folded').write_text('')
+    profiling.prune_profiles(tmp_path, 1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        '20260101T000002000000-abc.spans.folded',
+        'merged.folded',
+        'notes.spans.folded',
+    ]
+
+
+def test_prune_profiles_keeps_newest(tmp_path):
+    for stamp in ('20260101T000001000000', '20260101T000002000000', '20260101T000003000000'):
+        for kind in ('spans', 'stacks'):
+            (tmp_path / f"{stamp}-abc.{kind}.folded").write_text('')
+    profiling.prune_profiles(tmp_path, 2)
+    assert sorted(p.name.split('-')[0] for p in tmp_path.iterdir()) == [
+        '20260101T000002000000', '20260101T000002000000',
+        '20260101T000003000000', '20260101T000003000000',
+    ]
+
+
+@profiling.profiled
+async def _handler():
+    with profiling.span('build'):
+        pass
+    with profiling.span('insert_one'):
+        await asyncio.sleep(0)
+    return 'ok'
+
+
+async def _app(scope, receive, send):
+    assert await _handler() == 'ok'
+    await send({'type': 'http.response.start', 'status': 201, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'{}'})
+
+
+def _run(middleware, headers=()):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/consultations', 'headers': list(headers)}
+    asyncio.run(middleware(scope, None, send))
+    return messages
+
+
+def test_middleware_profiles_with_matching_token(tmp_path):
+    middleware = profiling.ProfilingMiddleware(_app, tmp_path, token='s3cret')
+    messages = _run(middleware, [(b'x-profile', b's3cret')])
+    assert [m['type'] for m in messages] == ['http.response.start', 'http.response.body']
+    spans, = tmp_path.glob('*.spans.folded')
+    paths = [line.rsplit(' ', 1)[0].split(';', 1)[1] for line in spans.read_text().splitlines()]
+    assert paths == ['validate', 'handler', 'handler;build', 'handler;insert_one', 'encode']
+    assert middleware._active is False
+
+
+async def _rejecting_app(scope, receive, send):
+    # Like FastAPI returning 422 before the handler runs
+    await send({'type': 'http.response.start', 'status': 422, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'{}'})
+
+
+def test_middleware_records_validate_when_handler_does_not_run(tmp_path):
+    middleware = profiling.ProfilingMiddleware(_rejecting_app, tmp_path, token='s3cret')
+    _run(middleware, [(b'x-profile', b's3cret')])
+    spans, = tmp_path.glob('*.spans.folded')
+    lines = spans.read_text().splitlines()
+    assert len(lines) == 1
+    assert lines[0].startswith('POST /api/consultations;validate ')
+
+
+@pytest.mark.parametrize('token, headers', [
+    (None, [(b'x-profile', b'1')]),
+    ('s3cret', [(b'x-profile', b'1')]),
+    ('s3cret', []),
+])
+def test_middleware_ignores_header_without_matching_token(tmp_path, token, headers):
+    middleware = profiling.ProfilingMiddleware(_app, tmp_path, token=token)
+    _run(middleware, headers)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_middleware_sample_rate(tmp_path, monkeypatch):
+    middleware = profiling.ProfilingMiddleware(_app, tmp_path, sample_rate=0.5)
+    monkeypatch.setattr(profiling.random, 'random', lambda: 0.9)
+    _run(middleware)
+    assert list(tmp_path.iterdir()) == []
+    monkeypatch.setattr(profiling.random, 'random', lambda: 0.1)
+    _run(middleware)
+    assert len(list(tmp_path.glob('*.folded'))) == 2
+
+
+def test_middleware_skips_while_another_request_is_profiled(tmp_path):
+    middleware = profiling.ProfilingMiddleware(_app, tmp_path, sample_rate=1.0)
+    middleware._active = True
+    _run(middleware)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_middleware_caps_profiles(tmp_path):
+    middleware = profiling.ProfilingMiddleware(_app, tmp_path, sample_rate=1.0, max_profiles=2)
+    for _ in range(4):
+        _run(middleware)
+    assert len(list(tmp_path.glob('*.spans.folded'))) == 2
+    assert len(list(tmp_path.glob('*.stacks.folded'))) == 2
+
+
+class _App:
+    def __init__(self):
+        self.middleware = []
+
+    def add_middleware(self, cls, **options):
+        self.middleware.append((cls, options))
+
+
+def test_add_profiling_disabled_without_profile_dir(monkeypatch):
+    monkeypatch.delenv('PROFILE_DIR', raising=False)
+    app = _App()
+    profiling.add_profiling(app)
+    assert app.middleware == []
+
+
+def test_add_profiling_reads_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    monkeypatch.setenv('PROFILE_SAMPLE_RATE', '0.01')
+    monkeypatch.setenv('PROFILE_TOKEN', 's3cret')
+    monkeypatch.setenv('PROFILE_MAX_PROFILES', '5')
+    app = _App()
+    profiling.add_profiling(app)
+    (cls, options), = app.middleware
+    assert cls is profiling.ProfilingMiddleware
+    assert options['output_dir'] == str(tmp_path)
+    assert options['sample_rate'] == 0.01
+    assert options['token'] == 's3cret'
+    assert options['max_profiles'] == 5
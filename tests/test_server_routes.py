@@ -0,0 +1,66 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+
+class StubCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class StubCollection:
+    """Records which operations were sent to it"""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.calls = []
+
+    def find(self, *args):
+        self.calls.append('find')
+        return StubCursor([dict(d) for d in self.docs])
+
+    async def insert_one(self, doc):
+        self.calls.append('insert_one')
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id='abc')
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv('MONGO_URL', 'mongodb://localhost:27017')
+    monkeypatch.setenv('DB_NAME', 'starton_test')
+    monkeypatch.delenv('MONGO_READ_URL', raising=False)
+    monkeypatch.delenv('PROFILE_DIR', raising=False)
+    module = importlib.import_module('server')
+    yield module
+    module.client.close()
+
+
+@pytest.fixture
+def collections(server, monkeypatch):
+    primary = StubCollection()
+    reader = StubCollection([{'id': 's1', 'client_name': 'acme'}])
+    monkeypatch.setattr(server, 'db', SimpleNamespace(status_checks=primary))
+    monkeypatch.setattr(server, 'status_checks_read', reader)
+    return primary, reader
+
+
+def test_get_status_checks_uses_read_collection(server, collections):
+    primary, reader = collections
+    status_checks = asyncio.run(server.get_status_checks())
+    assert reader.calls == ['find']
+    assert primary.calls == []
+    assert [s.client_name for s in status_checks] == ['acme']
+
+
+def test_create_status_check_writes_to_primary(server, collections):
+    primary, reader = collections
+    status_check = asyncio.run(server.create_status_check(server.StatusCheckCreate(client_name='acme')))
+    assert status_check.client_name == 'acme'
+    assert primary.calls == ['insert_one']
+    assert reader.calls == []